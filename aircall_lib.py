@@ -0,0 +1,239 @@
+import os
+import base64
+import time
+import array
+from collections.abc import Iterator
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+AIRCALL_API_ID = os.environ["AIRCALL_API_ID"]
+AIRCALL_API_TOKEN = os.environ["AIRCALL_API_TOKEN"]
+SLACK_WEBHOOK_URL = os.environ["SLACK_WEBHOOK_URL"]
+
+TZ = ZoneInfo("Australia/Brisbane")
+
+# Aircall /v1/calls caps per_page at 50, so ask for the maximum every time
+PER_PAGE = 50
+MAX_WORKERS = 8
+MAX_RETRIES = 4
+
+# Today's totals are cached on disk so later runs only fetch calls made since
+# the previous one. The resume point trails "now" a little to pick up calls
+# that show up in the API late; already-counted ids in that window are skipped.
+CACHE_DIR = os.environ.get("AIRCALL_CACHE_DIR", ".aircall_cache")
+RESUME_OVERLAP_S = 300
+
+# One keep-alive pool for Aircall and Slack, so pages reuse a TLS connection
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+# Ask for compressed JSON explicitly; requests/urllib3 decode it transparently
+_SESSION.headers["Accept-Encoding"] = "gzip, deflate"
+
+# Credentials are fixed for the life of the process, so encode them once
+_AUTH_HEADER = "Basic " + base64.b64encode(
+    f"{AIRCALL_API_ID}:{AIRCALL_API_TOKEN}".encode("utf-8")
+).decode("utf-8")
+_SESSION.headers["Authorization"] = _AUTH_HEADER
+
+
+def fetch_calls(from_unix: int, to_unix: int, page: int, per_page: int = PER_PAGE) -> dict:
+    url = "https://api.aircall.io/v1/calls"
+    params = {
+        "from": str(from_unix),
+        "to": str(to_unix),
+        "page": page,
+        "per_page": per_page,
+        "order": "asc",
+    }
+    for attempt in range(MAX_RETRIES + 1):
+        r = _SESSION.get(url, params=params, timeout=30)
+        # Back off and retry on rate limiting / transient server errors
+        if (r.status_code == 429 or r.status_code >= 500) and attempt < MAX_RETRIES:
+            time.sleep(2 ** attempt)
+            continue
+        r.raise_for_status()
+        return orjson.loads(r.content)
+
+
+def iter_calls(from_unix: int, to_unix: int, per_page: int = PER_PAGE) -> Iterator[dict]:
+    # Yields page by page so each decoded page can be dropped once consumed
+    data = fetch_calls(from_unix=from_unix, to_unix=to_unix, page=1, per_page=per_page)
+    yield from data.get("calls") or ()
+
+    # Page 1's meta gives the total, so the exact page count is known up front
+    # and pages 2..last_page go out in one concurrent burst
+    meta = data.get("meta") or {}
+    per_page = int(meta.get("per_page") or per_page)
+    last_page = -(-int(meta.get("total") or 0) // per_page)
+    if last_page < 2:
+        return
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        pages = pool.map(
+            lambda p: fetch_calls(
+                from_unix=from_unix, to_unix=to_unix, page=p, per_page=per_page
+            ),
+            range(2, last_page + 1),
+        )
+        for data in pages:
+            yield from data.get("calls") or ()
+
+
+def post_to_slack(text: str) -> None:
+    # Don't send the session's Aircall credentials to Slack
+    r = _SESSION.post(
+        SLACK_WEBHOOK_URL,
+        json={"text": text},
+        headers={"Authorization": None},
+        timeout=30,
+    )
+    r.raise_for_status()
+
+
+def day_window(now_local: datetime) -> tuple[int, int]:
+    # Local midnight as epoch seconds. Brisbane has no DST, so the current
+    # UTC offset is also the offset at midnight.
+    off = int(now_local.utcoffset().total_seconds())
+    to_unix = int(now_local.timestamp())
+    from_unix = (to_unix + off) // 86400 * 86400 - off
+    return from_unix, to_unix
+
+
+def cache_path(name: str, day: str) -> str:
+    return os.path.join(CACHE_DIR, f"{name}_{day}.json")
+
+
+def load_stats_cache(
+    path: str,
+    slot: dict[int, int],
+    out: array.array,
+    inn: array.array,
+    talk: array.array,
+) -> tuple[int | None, dict[int, int]]:
+    # Restores cached totals into the counters. Returns where to resume
+    # fetching (None without a cache) and {call id: started_at} for calls
+    # already counted at or after that point.
+    try:
+        with open(path, "rb") as f:
+            cache = orjson.loads(f.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return None, {}
+
+    for sid, (o, i, t) in cache["stats"].items():
+        s = slot.get(int(sid))
+        if s is not None:
+            out[s], inn[s], talk[s] = o, i, t
+
+    seen = {int(cid): started for cid, started in cache["seen"].items()}
+    return cache["resume_from"], seen
+
+
+def save_stats_cache(
+    path: str,
+    sdrs: list[dict],
+    out: array.array,
+    inn: array.array,
+    talk: array.array,
+    seen: dict[int, int],
+    open_calls: list[tuple[int, str, int]],
+    resume_from: int,
+) -> None:
+    # Calls still in progress are backed out of the cached totals and the
+    # resume point moves back to the earliest of them, so the next run
+    # counts them again with their final talk time.
+    settled = {"outbound": array.array("q", out), "inbound": array.array("q", inn)}
+    for s, direction, started in open_calls:
+        counter = settled.get(direction)
+        if counter is not None:
+            counter[s] -= 1
+        resume_from = min(resume_from, started)
+
+    cache = {
+        "resume_from": resume_from,
+        "stats": {
+            str(u["id"]): (settled["outbound"][s], settled["inbound"][s], talk[s])
+            for s, u in enumerate(sdrs)
+        },
+        "seen": {
+            str(cid): started for cid, started in seen.items() if started >= resume_from
+        },
+    }
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(orjson.dumps(cache))
+    os.replace(tmp, path)
+
+
+def aggregate(
+    sdrs: list[dict], now_local: datetime, cache_name: str
+) -> tuple[array.array, array.array, array.array]:
+    # Today's outbound / inbound / talk-seconds totals, one slot per entry in
+    # sdrs (same order).
+    from_unix, to_unix = day_window(now_local)
+
+    # Dense slot per SDR id; per-SDR counters live in arrays indexed by slot
+    slot = {u["id"]: i for i, u in enumerate(sdrs)}
+    out = array.array("q", [0] * len(sdrs))
+    inn = array.array("q", [0] * len(sdrs))
+    talk = array.array("q", [0] * len(sdrs))
+    dir_counter = {"outbound": out, "inbound": inn}
+
+    path = cache_path(cache_name, now_local.strftime("%Y-%m-%d"))
+    resume_from, seen = load_stats_cache(path, slot, out, inn, talk)
+    if resume_from is None:
+        resume_from = from_unix
+
+    # Counted in this report but not cached yet: (slot, direction, started_at)
+    open_calls = []
+
+    # The API only returns calls inside [from, to], so no client-side time filter
+    for c in iter_calls(from_unix=resume_from, to_unix=to_unix):
+        user = c.get("user") or {}
+        s = slot.get(user.get("id"))
+        if s is None:
+            continue
+
+        cid = c.get("id")
+        if cid in seen:
+            continue
+
+        direction = c.get("direction")
+        counter = dir_counter.get(direction)
+        if counter is not None:
+            counter[s] += 1
+
+        # Talk time. Aircall sends epoch ints; digit strings are tolerated too.
+        a = c.get("answered_at")
+        ended_at = e = c.get("ended_at")
+        if type(a) is not int or type(e) is not int:
+            try:
+                a, e = int(a or 0), int(e or 0)
+            except (TypeError, ValueError):
+                a = e = 0
+        if a and e > a:
+            talk[s] += e - a
+
+        started_at = c.get("started_at") or resume_from
+        if ended_at:
+            seen[cid] = started_at
+        else:
+            open_calls.append((s, direction, started_at))
+
+    save_stats_cache(
+        path,
+        sdrs,
+        out,
+        inn,
+        talk,
+        seen,
+        open_calls,
+        resume_from=max(resume_from, to_unix - RESUME_OVERLAP_S),
+    )
+
+    return out, inn, talk